@@ -1,8 +1,13 @@
+import glob
 import os
 import sys
 from osgeo import ogr, gdal
 import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 
 # Logger configuratie
 logging.basicConfig(
@@ -34,6 +39,112 @@ class BuoyExtractor:
     LIGHT_OBJECTS = ['LIGHTS', 'LITFLT']  # Lichten, drijvende lichten
     TOPMARK_OBJECTS = ['TOPMAR']  # Topmarkeringen
     
+    # Kleurcode naar beschrijving
+    COLOR_MAP = {
+        1: 'wit', 
+        2: 'zwart', 
+        3: 'rood', 
+        4: 'groen', 
+        5: 'blauw',
+        6: 'geel', 
+        7: 'grijs', 
+        8: 'bruin', 
+        9: 'amber', 
+        10: 'violet',
+        11: 'oranje', 
+        12: 'magenta', 
+        13: 'roze'
+    }
+    
+    # Patrooncode naar beschrijving
+    PATTERN_MAP = {
+        1: 'horizontaal gestreept',
+        2: 'verticaal gestreept',
+        3: 'diagonaal gestreept',
+        4: 'geruit',
+        5: 'geblokt'
+    }
+    
+    # Vormcode van boeien naar beschrijving
+    BUOY_SHAPE_MAP = {
+        1: 'ton',
+        2: 'cilinder',
+        3: 'kegel',
+        4: 'bol',
+        5: 'sparbaken',
+        6: 'paal',
+        7: 'boei met lantaarn',
+        8: 'tol'
+    }
+    
+    # Vormcode van topmarkeringen naar beschrijving
+    TOPMARK_SHAPE_MAP = {
+        1: 'kegel omhoog',
+        2: 'kegel omlaag',
+        3: 'twee kegels puntomhoog',
+        4: 'twee kegels puntomlaag',
+        5: 'twee kegels punten naar elkaar',
+        6: 'twee kegels punten van elkaar',
+        7: 'bol',
+        8: 'kruis',
+        9: 'x-vorm',
+        10: 'kubus',
+        11: 'cilinder',
+        12: 'bord',
+        13: 'ruit',
+        14: 'rechthoek',
+        15: 'bezemstek',
+        16: 'bezem omlaag',
+        17: 'bezem omhoog',
+        18: 'driehoek',
+        19: 'T-vorm',
+        20: 'cirkel',
+        21: 'halve bol',
+        22: 'tonvormig',
+        23: 'bol over rom',
+        24: 'ruit over bol',
+        25: 'cirkelschijf',
+        26: 'twee bollen',
+        27: 'twee rechthoekige borden',
+        28: 'diagonaal bord',
+        29: 'vierkant over driehoek'
+    }
+    
+    # Karaktercode van lichten naar beschrijving
+    LIGHT_CHARACTER_MAP = {
+        1: 'vast',
+        2: 'groepschitterend',
+        3: 'flikkerlicht',
+        4: 'onderbroken',
+        5: 'schitterlicht',
+        6: 'ultrasnel flikkerlicht',
+        7: 'isofase',
+        8: 'occulterende',
+        9: 'langzaam flikkerlicht',
+        10: 'morse code',
+        11: 'ononderbroken ultrasnel flikkerlicht',
+        12: 'vast schitterlicht',
+        13: 'vast groepschitterlicht',
+        14: 'langzaam onderbroken',
+        15: 'onderbroken groepslicht',
+        16: 'occulterende groepslicht',
+        17: 'onderbroken ultrasnel flikkerlicht',
+        18: 'langzaam flikkerende groepslicht',
+        19: 'flikkerende groepslicht',
+        20: 'groep occulterende',
+        25: 'kort-lang schitterlicht',
+        26: 'ultrasnel groep flikkerlicht',
+        27: 'display licht'
+    }
+    
+    # Attributen die per objecttype gelezen worden, hiervan worden de veldindices per laag bepaald
+    BUOY_FIELDS = ['LNAM', 'LNAM_REFS', 'OBJNAM', 'COLOUR', 'COLPAT', 'BOYSHP', 'CATCAM', 'CATLAM', 'MARSYS']
+    RELATED_FIELDS = ['LNAM', 'COLOUR', 'COLPAT', 'TOPSHP', 'LITCHR', 'SIGPER', 'SIGGRP', 'VALNMR']
+    
+    # Maximale afstand waarbinnen objecten als gekoppeld aan de boei gelden
+    # De drempelwaarde moet mogelijk aangepast worden afhankelijk van de data
+    RELATED_TOLERANCE = 0.0001  # ~10m op zeeniveau
+    
     # Definities voor binnenvaartbetonning (IENC specifiek)
     INLAND_BUOY_SYSTEMS = {
         'catlam': {  # Categorie laterale markering
@@ -61,6 +172,20 @@ class BuoyExtractor:
         self.enc_file = enc_file
         self.output_dir = output_dir
         self.buoy_data = []
+        # Lagen van het geopende dataset op naam
+        self._layers_by_name = {}
+        # Alle gerelateerde objecten in leesvolgorde
+        self._related_objects = []
+        # Gerelateerde objecten op LNAM, voor de koppelingen in LNAM_REFS
+        self._related_by_lnam = {}
+        # Ruimtelijke index van gerelateerde objecten: gridcel -> lijst met objecten,
+        # wordt pas opgebouwd als een boei zonder LNAM_REFS dat nodig maakt
+        self._related_index = None
+        # Aantal boeien per ontbrekend veld, wordt na afloop in één keer gelogd
+        self._missing_required = Counter()
+        self._missing_optional = Counter()
+        # Voorkom het opbouwen van debugmeldingen per feature als debuglogging uit staat
+        self._log_debug = logger.isEnabledFor(logging.DEBUG)
     
     def extract_buoys(self):
         """
@@ -69,6 +194,7 @@ class BuoyExtractor:
         try:
             logger.info(f"Verwerken van {self.enc_file}")
             self.process_enc_file()
+            self.log_missing_fields()
         except Exception as e:
             logger.error(f"Fout bij verwerken van {self.enc_file}: {str(e)}")
     
@@ -84,91 +210,109 @@ class BuoyExtractor:
             raise Exception("S57 driver niet gevonden. Controleer of GDAL/OGR correct is geïnstalleerd.")
         
         # Open het ENC-bestand met OGR
+        dataset = None
         try:
             # Geef S-57 specifieke opties aan GDAL
             #options = ["LNAM_REFS=ON", "RETURN_PRIMITIVES=ON", "RETURN_LINKAGES=ON"]
             #dataset = driver.Open(self.enc_file, 0, options)
             # Open the file with options
-            dataset = gdal.OpenEx(self.enc_file, 
-                                gdal.OF_VECTOR, 
-                                open_options=["LNAM_REFS=ON", "RETURN_PRIMITIVES=ON", "RETURN_LINKAGES=ON"])
+            # OpenEx opent zonder OF_UPDATE al alleen-lezen, OF_READONLY maakt dat alleen expliciet.
+            old_readdir = gdal.GetConfigOption('GDAL_DISABLE_READDIR_ON_OPEN')
+            # Sla het uitlezen van de map bij het openen over (traag op netwerkschijven),
+            # de S-57 driver opent eventuele updatebestanden (.001, .002, ...) zelf op naam.
+            # De optie geldt voor het hele proces en wordt daarom direct na het openen teruggezet.
+            gdal.SetConfigOption('GDAL_DISABLE_READDIR_ON_OPEN', 'EMPTY_DIR')
+            try:
+                dataset = gdal.OpenEx(self.enc_file, 
+                                    gdal.OF_VECTOR | gdal.OF_READONLY, 
+                                    open_options=["LNAM_REFS=ON", "RETURN_PRIMITIVES=ON", "RETURN_LINKAGES=ON"])
+            finally:
+                gdal.SetConfigOption('GDAL_DISABLE_READDIR_ON_OPEN', old_readdir)
             
             if dataset is None:
                 raise Exception(f"Kon ENC-bestand niet openen: {self.enc_file}")
             
-            # Doorloop alle lagen in het dataset
+            # Doorloop eenmalig alle lagen in het dataset en onthoud ze op naam
             layer_count = dataset.GetLayerCount()
             logger.info(f"Aantal lagen in dataset: {layer_count}")
             
-            # Zoek naar boeiobjecten in alle lagen
+            self._layers_by_name = {}
             for i in range(layer_count):
                 layer = dataset.GetLayerByIndex(i)
-                layer_name = layer.GetName()
+                self._layers_by_name[layer.GetName()] = layer
+            
+            # Bouw eenmalig de index van lichten en topmarkeringen op
+            self.build_related_index()
+            
+            # Verwerk alleen de lagen die boeiobjecten bevatten. Lagen van één vector dataset zijn niet
+            # thread-safe (GDAL_OF_THREAD_SAFE geldt alleen voor rasters), daarom worden de boeilagen
+            # sequentieel uit dit ene dataset gelezen.
+            for layer_name in self.BUOY_OBJECT_CLASSES:
+                layer = self._layers_by_name.get(layer_name)
+                if layer is None:
+                    continue
                 
-                # Alleen doorgaan als deze laag een van de boeiobjecten kan bevatten
-                if layer_name in self.BUOY_OBJECT_CLASSES:
-                    logger.info(f"Verwerken van laag: {layer_name}")
-                    self.process_layer(dataset, layer)
-            
-            dataset = None  # Sluit het dataset
+                logger.info(f"Verwerken van laag: {layer_name}")
+                self.process_layer(layer)
             
         except Exception as e:
             logger.error(f"Fout bij verwerken van {self.enc_file}: {str(e)}")
+        
+        finally:
+            # Laat geen lagen of features van het dataset achter, ook niet na een fout
+            self._layers_by_name = {}
+            self._related_objects = []
+            self._related_by_lnam = {}
+            self._related_index = None
+            dataset = None  # Sluit het dataset
     
-    def process_layer(self, dataset, layer):
+    def process_layer(self, layer):
         """
         Verwerkt een enkele laag om boeiobjecten te extraheren
         
         Args:
-            dataset (ogr.DataSource): OGR dataset
             layer (ogr.Layer): OGR laag
         """
-        # Reset de leesstrategie om alle features te lezen
-        layer.ResetReading()
+        # Bepaal de veldindices van de attributen die voor de boeigegevens nodig zijn
+        fld_idx = self.get_field_indices(layer, self.BUOY_FIELDS)
+        
+        # Elke S-57 laag bevat precies één objectklasse, het type hoeft dus niet per feature vertaald te worden
+        obj_type = layer.GetName()
+        
+        # Laat GDAL alleen features doorgeven die een boei zijn
+        layer.SetAttributeFilter("OBJL IS NOT NULL AND PRIM IS NOT NULL")
         
-        # Lees alle features in de laag
-        feature = layer.GetNextFeature()
-        while feature is not None:
-            # Controleer of dit feature een boei is
-            obj_class = feature.GetField('OBJL') if feature.IsFieldSet('OBJL') else None
-            primitive = feature.GetField('PRIM') if feature.IsFieldSet('PRIM') else None
+        try:
+            # Reset de leesstrategie om alle features te lezen
+            layer.ResetReading()
             
-            if obj_class and primitive:
-                buoy_data = self.extract_buoy_data(dataset, feature)
+            # Lees alle features in de laag
+            feature = layer.GetNextFeature()
+            while feature is not None:
+                buoy_data = self.extract_buoy_data(feature, fld_idx, obj_type)
                 if buoy_data:
                     self.buoy_data.append(buoy_data)
-            
-            # Ga naar de volgende feature
-            feature = layer.GetNextFeature()
+                
+                # Ga naar de volgende feature
+                feature = layer.GetNextFeature()
+        finally:
+            layer.SetAttributeFilter(None)
     
-    def extract_buoy_data(self, dataset, feature):
+    def extract_buoy_data(self, feature, fld_idx, obj_type):
         """
         Extraheert gegevens van een specifieke boei
         
         Args:
-            dataset (ogr.DataSource): OGR dataset
             feature (ogr.Feature): OGR feature
+            fld_idx (dict): Veldindices van de laag van de feature
+            obj_type (str): Objectklasse van de laag, bijvoorbeeld 'BOYLAT'
             
         Returns:
             dict: Dictionary met boeikenmerken
         """
         try:
             # Basisgegevens van de boei
-            feature_id = feature.GetField('LNAM') if feature.IsFieldSet('LNAM') else feature.GetFID()
-            obj_class = feature.GetField('OBJL') if feature.IsFieldSet('OBJL') else None
-            
-            # Zet numerieke objectklasse om naar string indien nodig
-            if isinstance(obj_class, int):
-                # Vertaal objectklassenummers naar namen indien beschikbaar
-                obj_class_map = {
-                    17: 'BOYLAT',
-                    18: 'BOYCAR',
-                    19: 'BOYISD',
-                    20: 'BOYSAW',
-                    22: 'BOYSPP',
-                    # Voeg hier meer toe indien nodig
-                }
-                obj_class = obj_class_map.get(obj_class, f"Unknown({obj_class})")
+            feature_id = self.get_field_value(feature, fld_idx, 'LNAM', None) or feature.GetFID()
             
             # Controleer of er positie-informatie is
             geometry = feature.GetGeometryRef()
@@ -177,54 +321,53 @@ class BuoyExtractor:
                 return None
             
             # Extract coördinaten (lat/lon)
-            if geometry.GetGeometryType() == ogr.wkbPoint:
-                lon = geometry.GetX()
-                lat = geometry.GetY()
-            else:
-                # Voor andere geometrietypen zoals lijnen of polygonen, gebruik het centroid
-                centroid = geometry.Centroid()
-                lon = centroid.GetX()
-                lat = centroid.GetY()
+            lon, lat = self.get_position(geometry)
             
             # Object naam ophalen (kan verschillen per implementatie)
-            name = ""
-            if feature.IsFieldSet('OBJNAM'):
-                name = feature.GetField('OBJNAM')
+            name = self.get_field_value(feature, fld_idx, 'OBJNAM', "")
             
             # Boei basisinformatie
             buoy_info = {
                 'id': feature_id,
-                'type': obj_class,
+                'type': obj_type,
                 'name': name,
                 'lon': lon,
                 'lat': lat,
-                'color': self.get_color_description(feature),
-                'shape': self.get_buoy_shape(feature),
-                'category': self.get_field_value(feature, 'CATCAM', ''),  # Categorie kardinale markering
-                'lateral_mark': self.get_field_value(feature, 'CATLAM', ''),  # Categorie laterale markering
-                'system': self.get_field_value(feature, 'MARSYS', ''),  # Betonningssysteem
+                'color': self.get_color_description(feature, fld_idx),
+                'shape': self.get_buoy_shape(feature, fld_idx),
+                'category': self.get_field_value(feature, fld_idx, 'CATCAM', ''),  # Categorie kardinale markering
+                'lateral_mark': self.get_field_value(feature, fld_idx, 'CATLAM', ''),  # Categorie laterale markering
+                'system': self.get_field_value(feature, fld_idx, 'MARSYS', ''),  # Betonningssysteem
+                # Velden van gekoppelde objecten, blijven leeg zonder topmarkering of licht
+                'topmark_shape': '',
+                'topmark_color': '',
+                'light_character': '',
+                'light_color': '',
+                'light_period': '',
+                'light_group': '',
+                'light_range': '',
             }
             
             # Bepaal of dit binnengaats of buitengaats betonning is
-            buoy_info['betonning_type'] = self.determine_buoy_system(feature)
+            buoy_info['betonning_type'] = self.determine_buoy_system(feature, fld_idx)
             
             # Zoek naar gekoppelde objecten voor deze boei
             # 1. Topmarkering
-            topmarks = self.find_related_objects(dataset, feature, self.TOPMARK_OBJECTS) 
+            topmarks = self.find_related_objects(feature, fld_idx, self.TOPMARK_OBJECTS)
             if topmarks:
-                topmark = topmarks[0]  # Neem de eerste topmarkering
-                buoy_info['topmark_shape'] = self.get_topmark_shape(topmark)
-                buoy_info['topmark_color'] = self.get_color_description(topmark)
+                topmark, topmark_idx = topmarks[0]  # Neem de eerste topmarkering
+                buoy_info['topmark_shape'] = self.get_topmark_shape(topmark, topmark_idx)
+                buoy_info['topmark_color'] = self.get_color_description(topmark, topmark_idx)
             
             # 2. Lichtkarakteristiek
-            lights = self.find_related_objects(dataset, feature, self.LIGHT_OBJECTS)
+            lights = self.find_related_objects(feature, fld_idx, self.LIGHT_OBJECTS)
             if lights:
-                light = lights[0]  # Neem het eerste licht
-                buoy_info['light_character'] = self.get_light_character(light)
-                buoy_info['light_color'] = self.get_color_description(light)
-                buoy_info['light_period'] = self.get_field_value(light, 'SIGPER', '')
-                buoy_info['light_group'] = self.get_field_value(light, 'SIGGRP', '')
-                buoy_info['light_range'] = self.get_field_value(light, 'VALNMR', '')
+                light, light_idx = lights[0]  # Neem het eerste licht
+                buoy_info['light_character'] = self.get_light_character(light, light_idx)
+                buoy_info['light_color'] = self.get_color_description(light, light_idx)
+                buoy_info['light_period'] = self.get_field_value(light, light_idx, 'SIGPER', '')
+                buoy_info['light_group'] = self.get_field_value(light, light_idx, 'SIGGRP', '')
+                buoy_info['light_range'] = self.get_field_value(light, light_idx, 'VALNMR', '')
                 
             # Controleer op ontbrekende velden
             self.check_missing_fields(buoy_info)
@@ -235,254 +378,272 @@ class BuoyExtractor:
             logger.error(f"Fout bij het verwerken van boei: {str(e)}")
             return None
     
-    def get_field_value(self, feature, field_name, default=''):
-        """Helper functie om veldwaarden op te halen"""
-        if feature.IsFieldSet(field_name):
-            return feature.GetField(field_name)
+    def get_field_value(self, feature, fld_idx, field_name, default=''):
+        """Helper functie om veldwaarden op te halen via de vooraf bepaalde veldindex"""
+        idx = fld_idx.get(field_name, -1)
+        if idx >= 0 and feature.IsFieldSetAndNotNull(idx):
+            return feature.GetField(idx)
         return default
     
-    def get_color_description(self, feature):
+    def get_field_indices(self, layer, field_names):
+        """
+        Bepaalt eenmalig per laag de veldindices van de opgegeven velden
+        
+        Args:
+            layer (ogr.Layer): OGR laag
+            field_names (list): Lijst met veldnamen die gelezen worden
+            
+        Returns:
+            dict: Veldindex per gelezen veldnaam, zodat features niet per naam doorzocht hoeven te worden,
+                  plus het veldtype van de lijstattributen COLOUR en COLPAT onder 'COLOUR_TYPE' en 'COLPAT_TYPE'
+        """
+        layer_defn = layer.GetLayerDefn()
+        fld_idx = {}
+        for i in range(layer_defn.GetFieldCount()):
+            field_defn = layer_defn.GetFieldDefn(i)
+            field_name = field_defn.GetName()
+            if field_name in field_names:
+                fld_idx[field_name] = i
+                # Het veldtype van lijstattributen verschilt per GDAL-versie, bepaal het één keer per laag
+                if field_name in ('COLOUR', 'COLPAT'):
+                    fld_idx[field_name + '_TYPE'] = field_defn.GetType()
+        return fld_idx
+    
+    def get_code_list(self, feature, fld_idx, field_name):
+        """
+        Leest een S-57 lijstattribuut als lijst met codes, volgens het veldtype van de laag
+        
+        Args:
+            feature (ogr.Feature): OGR feature
+            fld_idx (dict): Veldindices van de laag van de feature
+            field_name (str): Naam van het lijstattribuut, 'COLOUR' of 'COLPAT'
+            
+        Returns:
+            list: Lijst met codes, leeg als het veld niet gezet is
+            
+        Raises:
+            ValueError: Als een code geen getal is
+        """
+        idx = fld_idx.get(field_name, -1)
+        if idx < 0 or not feature.IsFieldSetAndNotNull(idx):
+            return []
+        
+        # Lees de codes direct volgens het veldtype van de laag, zonder typecontroles per feature
+        field_type = fld_idx.get(field_name + '_TYPE')
+        if field_type == ogr.OFTIntegerList:
+            return feature.GetFieldAsIntegerList(idx)
+        if field_type == ogr.OFTStringList:
+            # Standaard levert de S-57 driver lijstattributen als lijst met tekst
+            return [int(c) for c in feature.GetFieldAsStringList(idx)]
+        
+        # Oudere GDAL-versies leveren de lijst als één tekst, bijvoorbeeld '1,3'
+        value = feature.GetField(idx)
+        if isinstance(value, str):
+            return [int(c.strip()) for c in value.split(',')]
+        return [int(value)]
+    
+    def get_color_description(self, feature, fld_idx):
         """
         Extraheert de kleur van een object
         
         Args:
             feature (ogr.Feature): OGR feature
+            fld_idx (dict): Veldindices van de laag van de feature
             
         Returns:
             str: Beschrijving van de kleur
         """
-        colors = []
-        if feature.IsFieldSet('COLOUR'):
-            colors = feature.GetField('COLOUR')
-            # Log voor debugging
-            logger.debug(f"Kleurwaarde uit feature: {colors}, type: {type(colors)}")
-        
-        color_pattern = ''
-        if feature.IsFieldSet('COLPAT'):
-            color_pattern = feature.GetField('COLPAT')
-        
-        if not colors:
+        try:
+            color_list = self.get_code_list(feature, fld_idx, 'COLOUR')
+        except (ValueError, TypeError):
+            logger.warning(f"Kon kleurcode niet verwerken: {feature.GetField(fld_idx['COLOUR'])}")
             return ''
         
-        # Kleurcode naar beschrijving omzetten
-        color_map = {
-            1: 'wit', 
-            2: 'zwart', 
-            3: 'rood', 
-            4: 'groen', 
-            5: 'blauw',
-            6: 'geel', 
-            7: 'grijs', 
-            8: 'bruin', 
-            9: 'amber', 
-            10: 'violet',
-            11: 'oranje', 
-            12: 'magenta', 
-            13: 'roze'
-        }
-        
-        # Patrooncode naar beschrijving
-        pattern_map = {
-            1: 'horizontaal gestreept',
-            2: 'verticaal gestreept',
-            3: 'diagonaal gestreept',
-            4: 'geruit',
-            5: 'geblokt'
-        }
+        if not color_list:
+            return ''
         
-        # Converteer kleurcodes naar namen, behandel zowel enkele waarden als lijsten
-        color_names = []
-        
-        # Behandel de verschillende mogelijke formaten van colors
-        if isinstance(colors, list):
-            # Als colors al een lijst is
-            color_list = colors
-        elif isinstance(colors, (int, float)):
-            # Als colors een enkele numerieke waarde is
-            color_list = [int(colors)]
-        else:
-            # Als colors een string is of iets anders, probeer het op te splitsen
-            try:
-                if isinstance(colors, str) and ',' in colors:
-                    color_list = [int(c.strip()) for c in colors.split(',')]
-                else:
-                    color_list = [int(colors)]
-            except (ValueError, TypeError):
-                logger.warning(f"Kon kleurcode niet verwerken: {colors}")
-                return ''
+        if self._log_debug:
+            # Log voor debugging
+            logger.debug(f"Kleurcodes uit feature: {color_list}")
         
         # Converteer elke code naar een kleurnaam
-        for color_code in color_list:
-            if color_code in color_map:
-                color_names.append(color_map[color_code])
-            else:
-                color_names.append(f"onbekend({color_code})")
-        
-        color_str = '/'.join(color_names)
+        color_str = '/'.join(self.COLOR_MAP.get(color_code, f"onbekend({color_code})") for color_code in color_list)
         
-        # Voeg patroon toe indien aanwezig
-        if color_pattern:
-            try:
-                pattern_code = int(color_pattern)
-                if pattern_code in pattern_map:
-                    color_str += f" ({pattern_map[pattern_code]})"
-            except (ValueError, TypeError):
-                pass
+        # Voeg patroon toe indien aanwezig, COLPAT is net als COLOUR een lijstattribuut
+        try:
+            pattern_codes = self.get_code_list(feature, fld_idx, 'COLPAT')
+        except (ValueError, TypeError):
+            pattern_codes = []
+        
+        if pattern_codes:
+            pattern = self.PATTERN_MAP.get(pattern_codes[0])
+            if pattern:
+                color_str += f" ({pattern})"
                 
         return color_str
     
-    def get_buoy_shape(self, feature):
+    def get_buoy_shape(self, feature, fld_idx):
         """
         Extraheert de vorm van een boei
         
         Args:
             feature (ogr.Feature): OGR feature
+            fld_idx (dict): Veldindices van de laag van de feature
             
         Returns:
             str: Beschrijving van de vorm
         """
-        shape = ''
-        if feature.IsFieldSet('BOYSHP'):
-            shape_code = feature.GetField('BOYSHP')
-            
-            # Vormcode naar beschrijving
-            shape_map = {
-                1: 'ton',
-                2: 'cilinder',
-                3: 'kegel',
-                4: 'bol',
-                5: 'sparbaken',
-                6: 'paal',
-                7: 'boei met lantaarn',
-                8: 'tol'
-            }
-            
-            try:
-                shape_code = int(shape_code)
-                if shape_code in shape_map:
-                    shape = shape_map[shape_code]
-            except ValueError:
-                pass
+        code = self.get_field_value(feature, fld_idx, 'BOYSHP', None)
+        if code is None:
+            return ''
         
-        return shape
+        return self._shape_from_code(code)
     
-    def get_topmark_shape(self, feature):
+    def get_topmark_shape(self, feature, fld_idx):
         """
         Extraheert de vorm van een topmarkering
         
         Args:
             feature (ogr.Feature): OGR feature
+            fld_idx (dict): Veldindices van de laag van de feature
             
         Returns:
             str: Beschrijving van de vorm
         """
-        shape = ''
-        if feature.IsFieldSet('TOPSHP'):
-            shape_code = feature.GetField('TOPSHP')
-            
-            # Vormcode naar beschrijving
-            shape_map = {
-                1: 'kegel omhoog',
-                2: 'kegel omlaag',
-                3: 'twee kegels puntomhoog',
-                4: 'twee kegels puntomlaag',
-                5: 'twee kegels punten naar elkaar',
-                6: 'twee kegels punten van elkaar',
-                7: 'bol',
-                8: 'kruis',
-                9: 'x-vorm',
-                10: 'kubus',
-                11: 'cilinder',
-                12: 'bord',
-                13: 'ruit',
-                14: 'rechthoek',
-                15: 'bezemstek',
-                16: 'bezem omlaag',
-                17: 'bezem omhoog',
-                18: 'driehoek',
-                19: 'T-vorm',
-                20: 'cirkel',
-                21: 'halve bol',
-                22: 'tonvormig',
-                23: 'bol over rom',
-                24: 'ruit over bol',
-                25: 'cirkelschijf',
-                26: 'twee bollen',
-                27: 'twee rechthoekige borden',
-                28: 'diagonaal bord',
-                29: 'vierkant over driehoek'
-            }
-            
-            try:
-                shape_code = int(shape_code)
-                if shape_code in shape_map:
-                    shape = shape_map[shape_code]
-            except ValueError:
-                pass
+        code = self.get_field_value(feature, fld_idx, 'TOPSHP', None)
+        if code is None:
+            return ''
         
-        return shape
+        return self._topmark_shape_from_code(code)
     
-    def get_light_character(self, feature):
+    def get_light_character(self, feature, fld_idx):
         """
         Extraheert de lichtkarakteristiek
         
         Args:
             feature (ogr.Feature): OGR feature
+            fld_idx (dict): Veldindices van de laag van de feature
             
         Returns:
             str: Beschrijving van de lichtkarakteristiek
         """
-        character = ''
-        if feature.IsFieldSet('LITCHR'):
-            char_code = feature.GetField('LITCHR')
-            
-            # Karaktercode naar beschrijving
-            char_map = {
-                1: 'vast',
-                2: 'groepschitterend',
-                3: 'flikkerlicht',
-                4: 'onderbroken',
-                5: 'schitterlicht',
-                6: 'ultrasnel flikkerlicht',
-                7: 'isofase',
-                8: 'occulterende',
-                9: 'langzaam flikkerlicht',
-                10: 'morse code',
-                11: 'ononderbroken ultrasnel flikkerlicht',
-                12: 'vast schitterlicht',
-                13: 'vast groepschitterlicht',
-                14: 'langzaam onderbroken',
-                15: 'onderbroken groepslicht',
-                16: 'occulterende groepslicht',
-                17: 'onderbroken ultrasnel flikkerlicht',
-                18: 'langzaam flikkerende groepslicht',
-                19: 'flikkerende groepslicht',
-                20: 'groep occulterende',
-                25: 'kort-lang schitterlicht',
-                26: 'ultrasnel groep flikkerlicht',
-                27: 'display licht'
-            }
+        code = self.get_field_value(feature, fld_idx, 'LITCHR', None)
+        if code is None:
+            return ''
+        
+        return self._char_from_code(code)
+    
+    def get_position(self, geometry):
+        """
+        Bepaalt de positie van een geometrie
+        
+        Args:
+            geometry (ogr.Geometry): OGR geometrie
             
-            try:
-                char_code = int(char_code)
-                if char_code in char_map:
-                    character = char_map[char_code]
-            except ValueError:
-                pass
+        Returns:
+            tuple: (x, y) coördinaten
+        """
+        # GetPoint_2D levert x en y in één aanroep in plaats van twee
+        if geometry.GetGeometryType() == ogr.wkbPoint:
+            return geometry.GetPoint_2D()
         
-        return character
+        # Voor andere geometrietypen zoals lijnen of polygonen, gebruik het centroid
+        return geometry.Centroid().GetPoint_2D()
+    
+    def grid_cell(self, x, y):
+        """Helper functie die de gridcel van een positie in de ruimtelijke index bepaalt"""
+        return (int(x // self.RELATED_TOLERANCE), int(y // self.RELATED_TOLERANCE))
     
-    def find_related_objects(self, dataset, feature, object_classes):
+    def build_related_index(self):
+        """
+        Leest alle lichten en topmarkeringen in het dataset en bouwt een index op LNAM op
+        
+        Elke gerelateerde laag wordt zo maar één keer gelezen, in plaats van één keer per boei.
+        Een ruimtelijk filter per boei (SetSpatialFilterRect) is daardoor overbodig: de S-57 driver
+        heeft geen ruimtelijke index en zou bij elke boei alsnog de hele laag doorlopen.
+        """
+        self._related_objects = []
+        self._related_by_lnam = {}
+        self._related_index = None
+        
+        for layer_name in self.LIGHT_OBJECTS + self.TOPMARK_OBJECTS:
+            layer = self._layers_by_name.get(layer_name)
+            if layer is None:
+                continue
+            
+            fld_idx = self.get_field_indices(layer, self.RELATED_FIELDS)
+            layer.ResetReading()
+            
+            related_feature = layer.GetNextFeature()
+            while related_feature is not None:
+                lnam = self.get_field_value(related_feature, fld_idx, 'LNAM', None)
+                if lnam:
+                    self._related_by_lnam[lnam] = (layer_name, related_feature, fld_idx)
+                
+                self._related_objects.append((layer_name, related_feature, fld_idx))
+                
+                # Ga naar de volgende feature
+                related_feature = layer.GetNextFeature()
+        
+        logger.info(f"Aantal gerelateerde objecten in index: {len(self._related_objects)}")
+    
+    def build_spatial_index(self):
+        """
+        Bouwt de ruimtelijke index van de gerelateerde objecten op
+        
+        Alleen nodig voor boeien zonder LNAM_REFS; zijn alle boeien gekoppeld, dan worden
+        de geometrieën van lichten en topmarkeringen nooit gelezen.
+        """
+        self._related_index = {}
+        
+        # Het volgnummer bewaart de leesvolgorde, zodat het eerste gevonden object gelijk blijft
+        for sequence, (layer_name, related_feature, fld_idx) in enumerate(self._related_objects):
+            related_geom = related_feature.GetGeometryRef()
+            if not related_geom:
+                continue
+            
+            related_x, related_y = self.get_position(related_geom)
+            cell = self.grid_cell(related_x, related_y)
+            self._related_index.setdefault(cell, []).append(
+                (sequence, layer_name, related_x, related_y, related_feature, fld_idx))
+    
+    def find_related_objects(self, feature, fld_idx, object_classes):
         """
         Zoekt naar objecten die gerelateerd zijn aan de boei
         
+        Heeft de boei koppelingen in LNAM_REFS (de S-57 master/slave relatie), dan worden alleen die
+        gebruikt. Anders wordt teruggevallen op objecten op dezelfde positie.
+        
+        Args:
+            feature (ogr.Feature): OGR feature van de boei
+            fld_idx (dict): Veldindices van de laag van de boei
+            object_classes (list): Lijst met objectklassen om naar te zoeken
+            
+        Returns:
+            list: Lijst met (feature, veldindices) tuples van gerelateerde objecten
+        """
+        refs = self.get_field_value(feature, fld_idx, 'LNAM_REFS', None)
+        if not refs:
+            return self.find_nearby_objects(feature, object_classes)
+        
+        related_objects = []
+        for ref in refs:
+            related = self._related_by_lnam.get(ref)
+            if related is not None and related[0] in object_classes:
+                related_objects.append((related[1], related[2]))
+        
+        return related_objects
+    
+    def find_nearby_objects(self, feature, object_classes):
+        """
+        Zoekt naar objecten op dezelfde positie als de boei via de ruimtelijke index
+        
         Args:
-            dataset (ogr.DataSource): OGR dataset
             feature (ogr.Feature): OGR feature van de boei
             object_classes (list): Lijst met objectklassen om naar te zoeken
             
         Returns:
-            list: Lijst met gerelateerde features
+            list: Lijst met (feature, veldindices) tuples van gerelateerde objecten
         """
         related_objects = []
         
@@ -491,63 +652,61 @@ class BuoyExtractor:
         if not boei_geom:
             return related_objects
             
-        boei_x = boei_geom.GetX() if boei_geom.GetGeometryType() == ogr.wkbPoint else boei_geom.Centroid().GetX()
-        boei_y = boei_geom.GetY() if boei_geom.GetGeometryType() == ogr.wkbPoint else boei_geom.Centroid().GetY()
+        boei_x, boei_y = self.get_position(boei_geom)
         
-        # Doorzoek alle lagen in het dataset op zoek naar gerelateerde objecten
-        layer_count = dataset.GetLayerCount()
+        if self._related_index is None:
+            self.build_spatial_index()
         
-        for i in range(layer_count):
-            layer = dataset.GetLayerByIndex(i)
-            layer_name = layer.GetName()
-            
-            # Controleer of deze laag een van de gezochte objectklassen bevat
+        # Alleen de gridcel van de boei en de aangrenzende cellen kunnen objecten binnen de drempelwaarde bevatten
+        cell_x, cell_y = self.grid_cell(boei_x, boei_y)
+        candidates = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                candidates.extend(self._related_index.get((cell_x + dx, cell_y + dy), ()))
+        candidates.sort(key=lambda entry: entry[0])
+        
+        # Vergelijk gekwadrateerde afstanden, dan is geen wortel nodig
+        max_distance_sq = self.RELATED_TOLERANCE * self.RELATED_TOLERANCE
+        
+        for _, layer_name, related_x, related_y, related_feature, fld_idx in candidates:
+            # Controleer of dit object een van de gezochte objectklassen is
             if layer_name not in object_classes:
                 continue
-                
-            # Reset de leesstrategie
-            layer.ResetReading()
             
-            # Doorloop alle features in de laag
-            related_feature = layer.GetNextFeature()
-            while related_feature is not None:
-                # Controleer op ruimtelijke relatie (objecten op dezelfde positie)
-                related_geom = related_feature.GetGeometryRef()
-                
-                if related_geom:
-                    related_x = related_geom.GetX() if related_geom.GetGeometryType() == ogr.wkbPoint else related_geom.Centroid().GetX()
-                    related_y = related_geom.GetY() if related_geom.GetGeometryType() == ogr.wkbPoint else related_geom.Centroid().GetY()
-                    
-                    # Berekenen van afstand (vereenvoudigd - in werkelijkheid zou je GIS functies gebruiken)
-                    distance = ((boei_x - related_x)**2 + (boei_y - related_y)**2)**0.5
-                    
-                    # Als objecten dicht bij elkaar liggen, beschouw ze als gerelateerd
-                    # De drempelwaarde moet mogelijk aangepast worden afhankelijk van de data
-                    if distance < 0.0001:  # ~10m op zeeniveau
-                        related_objects.append(related_feature)
-                
-                # Ga naar de volgende feature
-                related_feature = layer.GetNextFeature()
+            # Berekenen van afstand (vereenvoudigd - in werkelijkheid zou je GIS functies gebruiken)
+            dx = boei_x - related_x
+            dy = boei_y - related_y
+            
+            # Als objecten dicht bij elkaar liggen, beschouw ze als gerelateerd
+            if dx * dx + dy * dy < max_distance_sq:
+                related_objects.append((related_feature, fld_idx))
         
         return related_objects
     
-    def determine_buoy_system(self, feature):
+    def determine_buoy_system(self, feature, fld_idx):
         """
         Bepaalt of de boei binnengaats of buitengaats betonning is
         
         Args:
             feature (ogr.Feature): OGR feature
+            fld_idx (dict): Veldindices van de laag van de feature
             
         Returns:
             str: 'Binnengaats', 'Buitengaats' of 'Onbekend'
         """
-        system = ''
-        if feature.IsFieldSet('MARSYS'):
-            system = feature.GetField('MARSYS')
+        system = self.get_field_value(feature, fld_idx, 'MARSYS', '')
         
         if not system:
             return 'Onbekend'
-            
+        
+        return self._system_from_marsys(system)
+    
+    # Codes komen maar in een handvol waarden voor, de vertalingen worden daarom per unieke code onthouden
+    
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _system_from_marsys(system):
+        """Vertaalt een MARSYS waarde naar 'Binnengaats', 'Buitengaats' of 'Onbekend'"""
         try:
             system = int(system)
             
@@ -559,9 +718,36 @@ class BuoyExtractor:
         except ValueError:
             return 'Onbekend'
     
+    @classmethod
+    @lru_cache(maxsize=64)
+    def _shape_from_code(cls, code):
+        """Vertaalt een BOYSHP code naar een beschrijving"""
+        try:
+            return cls.BUOY_SHAPE_MAP.get(int(code), '')
+        except ValueError:
+            return ''
+    
+    @classmethod
+    @lru_cache(maxsize=64)
+    def _topmark_shape_from_code(cls, code):
+        """Vertaalt een TOPSHP code naar een beschrijving"""
+        try:
+            return cls.TOPMARK_SHAPE_MAP.get(int(code), '')
+        except ValueError:
+            return ''
+    
+    @classmethod
+    @lru_cache(maxsize=64)
+    def _char_from_code(cls, code):
+        """Vertaalt een LITCHR code naar een beschrijving"""
+        try:
+            return cls.LIGHT_CHARACTER_MAP.get(int(code), '')
+        except ValueError:
+            return ''
+    
     def check_missing_fields(self, buoy_info):
         """
-        Controleert op ontbrekende velden en logt waarschuwingen
+        Controleert op ontbrekende velden en telt ze voor de samenvatting in log_missing_fields
         
         Args:
             buoy_info (dict): Boei-informatie
@@ -571,18 +757,31 @@ class BuoyExtractor:
         
         for field in required_fields:
             if not buoy_info.get(field):
-                logger.error(f"Boei mist verplicht veld: {field}")
+                self._missing_required[field] += 1
                 
         for field in warning_fields:
             if not buoy_info.get(field):
-                logger.warning(f"Boei {buoy_info.get('id', 'UNKNOWN')} mist veld: {field}")
+                self._missing_optional[field] += 1
+                if self._log_debug:
+                    logger.debug(f"Boei {buoy_info.get('id', 'UNKNOWN')} mist veld: {field}")
     
-    def save_to_text(self, output_file):
+    def log_missing_fields(self):
+        """
+        Logt per veld in één melding hoeveel boeien dat veld missen
+        """
+        for field, count in self._missing_required.items():
+            logger.error(f"{count} boeien missen verplicht veld: {field}")
+        
+        for field, count in self._missing_optional.items():
+            logger.warning(f"{count} boeien missen veld: {field}")
+    
+    def save_to_text(self, output_file, echo=True):
         """
         Slaat de verzamelde boeigegevens op als tekstbestand en drukt ze af naar stdout
         
         Args:
             output_file (str): Uitvoerbestandsnaam
+            echo (bool): Druk de tabel ook af naar stdout als dat een terminal is
         """
         if not self.buoy_data:
             logger.warning("Geen boeigegevens om op te slaan")
@@ -622,7 +821,7 @@ class BuoyExtractor:
         # Bereid de uitvoermap voor
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
-        # Maak de uitvoertekst
+        # Maak de kopregels
         header = "# Boei informatie geëxtraheerd uit " + self.enc_file
         header += "\n# Gegenereerd op " + datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         header += "\n# Aantal boeien: " + str(len(self.buoy_data))
@@ -630,53 +829,96 @@ class BuoyExtractor:
         
         # Voeg kolomkoppen toe
         header += "\t".join([field_names.get(field, field) for field in field_order])
+        header += "\n"
         
-        # Bereid de datarijen voor
-        rows = []
-        for buoy in self.buoy_data:
-            row = []
-            for field in field_order:
-                # Haal de waarde op, gebruik lege string als het veld niet bestaat
-                value = buoy.get(field, "")
-                # Converteer naar string
-                row.append(str(value))
-            rows.append("\t".join(row))
+        # Schrijf naar bestand, de rijen worden direct weggeschreven in plaats van eerst één tekst op te bouwen
+        with open(output_file, 'w', encoding='utf-8', newline='', buffering=1 << 20) as f:
+            self.write_table(f, header, field_order)
         
-        # Combineer alles
-        output_text = header + "\n" + "\n".join(rows)
+        logger.info(f"{len(self.buoy_data)} boeien opgeslagen in {output_file}")
         
-        # Schrijf naar bestand
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(output_text)
+        # Print naar stdout, alleen als er iemand meekijkt; bij omleiden staat alles al in het bestand
+        if echo and sys.stdout.isatty():
+            self.write_table(sys.stdout, header, field_order)
+    
+    def write_table(self, f, header, field_order):
+        """
+        Schrijft de kopregels en een tab-gescheiden rij per boei naar een stream
         
-        logger.info(f"{len(self.buoy_data)} boeien opgeslagen in {output_file}")
+        Args:
+            f (file): Uitvoerstream
+            header (str): Kopregels inclusief kolomkoppen
+            field_order (list): Veldnamen in kolomvolgorde
+        """
+        f.write(header)
+        # Elke boei bevat alle velden (zie extract_buoy_data), waarden worden ongewijzigd als tekst geschreven
+        getter = itemgetter(*field_order)
+        f.writelines('\t'.join(map(str, getter(buoy))) + '\n' for buoy in self.buoy_data)
+
+
+def process_enc(enc_file, output_dir, echo=True):
+    """
+    Extraheert en bewaart de boeien van één ENC-bestand
+    
+    Draait in een eigen proces, zodat elk proces zijn eigen GDAL-handles heeft.
+    
+    Args:
+        enc_file (str): Pad naar het ENC-bestand
+        output_dir (str): Pad naar de output map
+        echo (bool): Druk de tabel ook af naar stdout als dat een terminal is
         
-        # Print naar stdout
-        print(output_text)
+    Returns:
+        int: Aantal gevonden boeien
+    """
+    cell_name = os.path.splitext(os.path.basename(enc_file))[0]
+    output_file = os.path.join(output_dir, f"boeien_{cell_name}.txt")
+    
+    extractor = BuoyExtractor(enc_file, output_dir)
+    extractor.extract_buoys()
+    
+    # Sla gegevens op in tekstformaat en druk af naar stdout
+    extractor.save_to_text(output_file, echo)
+    
+    return len(extractor.buoy_data)
 
 
 def main():
     """Hoofdfunctie voor het uitvoeren van de extractie"""
-    # Gebruik specifieke paden zoals aangegeven
-    enc_file = "/home/jeroen/gis_data/ENC/1R7HV002/1R7HV002.000"
+    # Gebruik de opgegeven ENC-bestanden, of alle cellen in de standaard ENC-map
+    enc_files = sys.argv[1:] or sorted(glob.glob("/home/jeroen/gis_data/ENC/*/*.000"))
     output_dir = "/home/jeroen/gis_data/output/"
-    output_file = os.path.join(output_dir, "boeien_data.txt")
     
-    # Controleer of het invoerbestand bestaat
-    if not os.path.exists(enc_file):
-        print(f"Fout: ENC-bestand niet gevonden: {enc_file}")
+    # Controleer of de invoerbestanden bestaan
+    if not enc_files:
+        print("Fout: geen ENC-bestanden gevonden")
         sys.exit(1)
     
-    # Maak een extractor met het specifieke ENC-bestand
-    extractor = BuoyExtractor(enc_file, output_dir)
+    for enc_file in enc_files:
+        if not os.path.exists(enc_file):
+            print(f"Fout: ENC-bestand niet gevonden: {enc_file}")
+            sys.exit(1)
     
-    logger.info("Start extractie van boeigegevens")
-    extractor.extract_buoys()
+    logger.info(f"Start extractie van boeigegevens uit {len(enc_files)} ENC-bestand(en)")
     
-    # Sla gegevens op in tekstformaat en druk af naar stdout
-    extractor.save_to_text(output_file)
+    # GDAL is niet thread-safe, verwerk meerdere cellen daarom in aparte processen
+    if len(enc_files) == 1:
+        buoy_counts = [process_enc(enc_files[0], output_dir)]
+    else:
+        buoy_counts = []
+        max_workers = min(len(enc_files), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # Geen uitvoer naar stdout vanuit de processen, anders lopen de tabellen van de cellen door elkaar
+            futures = {executor.submit(process_enc, enc_file, output_dir, False): enc_file
+                       for enc_file in enc_files}
+            
+            # Een fout in één cel mag de resultaten van de andere cellen niet tegenhouden
+            for future in as_completed(futures):
+                try:
+                    buoy_counts.append(future.result())
+                except Exception as e:
+                    logger.error(f"Fout bij verwerken van {futures[future]}: {str(e)}")
     
-    logger.info("Extractie voltooid")
+    logger.info(f"Extractie voltooid, {sum(buoy_counts)} boeien in totaal")
 
 
 if __name__ == "__main__":